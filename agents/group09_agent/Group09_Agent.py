@@ -1,8 +1,13 @@
+import hashlib
 import logging
-from random import randint
+import os
+import tempfile
+from itertools import chain
+from pathlib import Path
 from time import time
 from typing import cast
 
+import numpy as np
 from geniusweb.actions.Accept import Accept
 from geniusweb.actions.Action import Action
 from geniusweb.actions.Offer import Offer
@@ -28,6 +33,7 @@ from geniusweb.references.Parameters import Parameters
 from tudelft_utilities_logging.ReportToLogger import ReportToLogger
 
 from .utils.opponent_model import OpponentModel
+from .utils.scoring import score_bids
 
 
 class Group09_Agent(DefaultParty):
@@ -50,6 +56,17 @@ class Group09_Agent(DefaultParty):
 
         self.last_received_bid: Bid = None
         self.opponent_model: OpponentModel = None
+
+        # struct-of-arrays representation of the bid space, see _build_bid_space
+        self._all_bids: AllBidsList = None
+        self._issues: list = None
+        self._value_indices: list = None
+        self._bid_matrix: np.ndarray = None
+        self._key_strides: np.ndarray = None
+        self._rows_by_key: np.ndarray = None
+        self._value_tables: list = None
+        self._utilities: np.ndarray = None
+        self._opp_utilities: np.ndarray = None
         self.logger.log(logging.INFO, "party is initialized")
 
     def notifyChange(self, data: Inform):
@@ -72,6 +89,9 @@ class Group09_Agent(DefaultParty):
 
             self.parameters = self.settings.getParameters()
             self.storage_dir = self.parameters.get("storage_dir")
+            # create the storage directory now, so that save_data only has to write
+            if self.storage_dir is not None:
+                os.makedirs(self.storage_dir, exist_ok=True)
 
             # the profile contains the preferences of the agent over the domain
             profile_connection = ProfileConnectionFactory.create(
@@ -81,6 +101,12 @@ class Group09_Agent(DefaultParty):
             self.domain = self.profile.getDomain()
             profile_connection.close()
 
+            # precompute our utility for every bid in the domain
+            self._build_bid_space()
+
+            # the domain is known now, so the opponent model can be created up front
+            self.opponent_model = OpponentModel(self.domain)
+
         # ActionDone informs you of an action (an offer or an accept)
         # that is performed by one of the agents (including yourself).
         elif isinstance(data, ActionDone):
@@ -90,7 +116,9 @@ class Group09_Agent(DefaultParty):
             # ignore action if it is our action
             if actor != self.me:
                 # obtain the name of the opponent, cutting of the position ID.
-                self.other = str(actor).rsplit("_", 1)[0]
+                # The opponent does not change during a session, so this is done once.
+                if self.other is None:
+                    self.other = str(actor).rsplit("_", 1)[0]
 
                 # process action done by opponent
                 self.opponent_action(action)
@@ -147,14 +175,11 @@ class Group09_Agent(DefaultParty):
         """
         # if it is an offer, set the last received bid
         if isinstance(action, Offer):
-            # create opponent model if it was not yet initialised
-            if self.opponent_model is None:
-                self.opponent_model = OpponentModel(self.domain)
-
             bid = cast(Offer, action).getBid()
 
             # update opponent model with bid
             self.opponent_model.update(bid)
+            self._update_opponent_utilities()
             # set bid as last received
             self.last_received_bid = bid
 
@@ -162,13 +187,18 @@ class Group09_Agent(DefaultParty):
         """This method is called when it is our turn. It should decide upon an action
         to perform and send this action to the opponent.
         """
+        # progress of the negotiation session between 0 and 1 (1 is deadline).
+        # It is read once per turn and handed to the helpers below, instead of
+        # querying the progress object for every candidate bid.
+        progress = self.progress.get(time() * 1000)
+
         # check if the last received offer is good enough
-        if self.accept_condition(self.last_received_bid):
+        if self.accept_condition(self.last_received_bid, progress):
             # if so, accept the offer
             action = Accept(self.me, self.last_received_bid)
         else:
             # if not, find a bid to propose as counter offer
-            bid = self.find_bid()
+            bid = self.find_bid(progress)
             action = Offer(self.me, bid)
 
         # send the action
@@ -180,68 +210,175 @@ class Group09_Agent(DefaultParty):
         Taking too much time might result in your agent being killed, so use it for storage only.
         """
         data = "Data for learning (see README.md)"
-        with open(f"{self.storage_dir}/data.md", "w") as f:
-            f.write(data)
+        Path(self.storage_dir, "data.md").write_text(data)
 
-    ###########################################################################################
-    ################################## Example methods below ##################################
-    ###########################################################################################
-
-    def accept_condition(self, bid: Bid) -> bool:
-        if bid is None:
-            return False
-
-        # progress of the negotiation session between 0 and 1 (1 is deadline)
-        progress = self.progress.get(time() * 1000)
+    def _build_bid_space(self):
+        """Encodes all bids of the domain as a (n_bids, n_issues) matrix of value indices,
+        with rows in AllBidsList order. Our utility for every bid is then computed at once
+        as the sum of the per-issue weighted value utilities, instead of through a
+        profile.getUtility call per bid.
+        """
+        self._all_bids = all_bids = AllBidsList(self.domain)
+        self._issues = sorted(self.domain.getIssues())
+        values = [self.domain.getValues(issue).getValues() for issue in self._issues]
+        self._value_indices = [{value: k for k, value in enumerate(vs)} for vs in values]
+
+        # the matrix only depends on the domain, so it is reused across sessions
+        cache_file = self._bid_matrix_cache_file(values)
+        self._bid_matrix = self._load_bid_matrix(cache_file, all_bids)
+
+        if self._bid_matrix is None:
+            # value indices are small, so the narrowest type keeps the column scans cheap
+            max_values = max((len(vs) for vs in values), default=0)
+            self._bid_matrix = np.fromiter(
+                chain.from_iterable(
+                    self._encode_bid(all_bids.get(i)) for i in range(all_bids.size())
+                ),
+                dtype=np.uint8 if max_values <= 256 else np.uint16,
+                count=all_bids.size() * len(self._issues),
+            ).reshape(all_bids.size(), len(self._issues))
+            self._save_bid_matrix(cache_file)
+
+        # every bid has a unique mixed-radix key in [0, n_bids) built from its value
+        # indices, which maps it back to its row through a plain array lookup
+        self._key_strides = np.ones(len(self._issues), dtype=np.int64)
+        for m in range(len(self._issues) - 2, -1, -1):
+            self._key_strides[m] = self._key_strides[m + 1] * len(values[m + 1])
+        self._rows_by_key = np.empty(all_bids.size(), dtype=np.int64)
+        self._rows_by_key[self._bid_matrix @ self._key_strides] = np.arange(
+            all_bids.size()
+        )
 
-        # very basic approach that accepts if the offer is valued above 0.7 and
-        # 95% of the time towards the deadline has passed
-        conditions = [
-            self.profile.getUtility(bid) > 0.8,
-            progress > 0.95,
+        # value_tables[m][k] is the weighted utility of value k of issue m
+        weights = self.profile.getWeights()
+        utilities = self.profile.getUtilities()
+        self._value_tables = [
+            np.array(
+                [float(weights[issue] * utilities[issue].getUtility(v)) for v in vs],
+                dtype=np.float64,
+            )
+            for issue, vs in zip(self._issues, values)
         ]
-        return all(conditions)
 
-    def find_bid(self) -> Bid:
-        # compose a list of all possible bids
-        domain = self.profile.getDomain()
-        all_bids = AllBidsList(domain)
+        self._utilities = np.zeros(all_bids.size(), dtype=np.float64)
+        for m, table in enumerate(self._value_tables):
+            self._utilities += table[self._bid_matrix[:, m]]
 
-        best_bid_score = 0.0
-        best_bid = None
+        self._opp_utilities = np.zeros(all_bids.size(), dtype=np.float64)
 
-        # take 500 attempts to find a bid according to a heuristic score
-        for _ in range(500):
-            bid = all_bids.get(randint(0, all_bids.size() - 1))
-            bid_score = self.score_bid(bid)
-            if bid_score > best_bid_score:
-                best_bid_score, best_bid = bid_score, bid
+    def _encode_bid(self, bid: Bid) -> tuple:
+        """Returns the value indices of a bid, in the column order of the bid matrix"""
+        return tuple(
+            self._value_indices[m][bid.getValue(issue)]
+            for m, issue in enumerate(self._issues)
+        )
 
-        return best_bid
+    def _bid_row(self, bid: Bid) -> int:
+        """Looks up the row of a bid in the bid matrix, so that received bids can use the
+        precomputed utilities.
+        """
+        key = 0
+        for m, issue in enumerate(self._issues):
+            key += self._value_indices[m][bid.getValue(issue)] * self._key_strides[m]
+        return int(self._rows_by_key[key])
+
+    def evaluate_bid(self, bid: Bid) -> float:
+        """Our utility of a bid, read from the precomputed utilities. Bids that are not in
+        the bid space (e.g. partial bids) fall back to the profile.
+        """
+        try:
+            return float(self._utilities[self._bid_row(bid)])
+        except KeyError:
+            return float(self.profile.getUtility(bid))
 
-    def score_bid(self, bid: Bid, alpha: float = 0.95, eps: float = 0.1) -> float:
-        """Calculate heuristic score for a bid
+    def _bid_matrix_cache_file(self, values: list) -> Path:
+        """File in the storage directory to cache the bid matrix of this domain in.
 
-        Args:
-            bid (Bid): Bid to score
-            alpha (float, optional): Trade-off factor between self interested and
-                altruistic behaviour. Defaults to 0.95.
-            eps (float, optional): Time pressure factor, balances between conceding
-                and Boulware behaviour over time. Defaults to 0.1.
+        AllBidsList enumerates the issues in set iteration order, which differs between
+        Python processes, so that order is part of the key next to the issues and values.
+        """
+        if self.storage_dir is None:
+            return None
 
-        Returns:
-            float: score
+        description = repr(
+            (
+                list(self.domain.getIssues()),
+                [(i, [str(v) for v in vs]) for i, vs in zip(self._issues, values)],
+            )
+        )
+        digest = hashlib.sha1(description.encode("utf-8")).hexdigest()[:16]
+        return Path(self.storage_dir, f"bid_matrix_{digest}.npy")
+
+    def _load_bid_matrix(self, cache_file: Path, all_bids: AllBidsList) -> np.ndarray:
+        """Loads a cached bid matrix, provided it still matches AllBidsList"""
+        if cache_file is None or not cache_file.exists():
+            return None
+
+        try:
+            bid_matrix = np.load(cache_file, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+        if bid_matrix.shape != (all_bids.size(), len(self._issues)):
+            return None
+
+        # spot check a few rows that depend on the enumeration order of every issue
+        for index in {0, all_bids.size() // 3, all_bids.size() - 1}:
+            if tuple(bid_matrix[index]) != self._encode_bid(all_bids.get(index)):
+                return None
+
+        return bid_matrix
+
+    def _save_bid_matrix(self, cache_file: Path):
+        """Stores the bid matrix for later sessions. Several instances of this agent can
+        run at the same time (even in the same process), so the file is written under a
+        unique temporary name and then moved into place. Caching is skipped if the
+        storage directory cannot be written.
         """
-        progress = self.progress.get(time() * 1000)
+        if cache_file is None:
+            return
+
+        tmp_file = None
+        try:
+            fd, tmp_file = tempfile.mkstemp(dir=cache_file.parent, suffix=".npy")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, self._bid_matrix)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            self.logger.log(logging.WARNING, f"Could not cache the bid matrix: {e}")
+            if tmp_file is not None and os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def _update_opponent_utilities(self):
+        """Recomputes the predicted opponent utility of every bid from the current state
+        of the opponent model, using the same bid matrix as our own utilities.
+        """
+        weights, value_utilities = self.opponent_model.snapshot_vectors(self._issues)
 
-        our_utility = float(self.profile.getUtility(bid))
+        # the issue weight is folded into the (small) value table before the lookup, so
+        # every issue costs a single gather over the bid matrix column
+        self._opp_utilities = np.zeros(self._bid_matrix.shape[0], dtype=np.float64)
+        for m, (weight, table) in enumerate(zip(weights, value_utilities)):
+            self._opp_utilities += (weight * table)[self._bid_matrix[:, m]]
 
-        time_pressure = 1.0 - progress ** (1 / eps)
-        score = alpha * time_pressure * our_utility
+    ###########################################################################################
+    ################################## Example methods below ##################################
+    ###########################################################################################
 
-        if self.opponent_model is not None:
-            opponent_utility = self.opponent_model.get_predicted_utility(bid)
-            opponent_score = (1.0 - alpha * time_pressure) * opponent_utility
-            score += opponent_score
+    def accept_condition(self, bid: Bid, progress: float) -> bool:
+        if bid is None:
+            return False
 
-        return score
+        # very basic approach that accepts if the offer is valued above 0.7 and
+        # 95% of the time towards the deadline has passed. The time condition is
+        # checked first, as it is cheaper and fails during most of the negotiation.
+        return progress > 0.95 and self.evaluate_bid(bid) > 0.8
+
+    def find_bid(self, progress: float) -> Bid:
+        # score every bid of the domain and take the exact best one, this costs less
+        # than the update of the opponent utilities after every received offer. The
+        # predicted opponent utilities are all 0.0 until the first offer is received.
+        bid_scores = score_bids(self._utilities, self._opp_utilities, progress)
+        best_index = np.argmax(bid_scores)
+
+        return self._all_bids.get(int(best_index))
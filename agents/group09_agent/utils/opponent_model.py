@@ -1,5 +1,6 @@
 from collections import defaultdict
 
+import numpy as np
 from geniusweb.issuevalue.Bid import Bid
 from geniusweb.issuevalue.DiscreteValueSet import DiscreteValueSet
 from geniusweb.issuevalue.Domain import Domain
@@ -56,8 +57,54 @@ class OpponentModel:
 
         return predicted_utility
 
+    def snapshot_vectors(self, issues: list):
+        """Exports the model as arrays, so that the predicted utility of many bids can be
+        computed at once. The result matches get_predicted_utility.
+
+        Args:
+            issues (list): Order in which the issues should be returned
+
+        Returns:
+            Tuple[np.ndarray, List[np.ndarray]]: normalised issue weights and, per issue,
+                the predicted utility of every value in the order of the domain's value set
+        """
+        issue_weights = np.array(
+            [self.issue_estimators[issue].weight for issue in issues], dtype=np.float64
+        )
+        value_utilities = [
+            np.array(
+                [
+                    self.issue_estimators[issue].get_value_utility(value)
+                    for value in self.domain.getValues(issue).getValues()
+                ],
+                dtype=np.float64,
+            )
+            for issue in issues
+        ]
+
+        # no offers received yet, every bid is predicted to have utility 0
+        if len(self.offers) == 0:
+            return np.zeros_like(issue_weights), value_utilities
+
+        # normalise the issue weights such that the sum is 1.0
+        total_issue_weight = issue_weights.sum()
+        if total_issue_weight == 0.0:
+            issue_weights = np.full_like(issue_weights, 1 / len(issue_weights))
+        else:
+            issue_weights = issue_weights / total_issue_weight
+
+        return issue_weights, value_utilities
+
 
 class IssueEstimator:
+    __slots__ = (
+        "bids_received",
+        "max_value_count",
+        "num_values",
+        "value_trackers",
+        "weight",
+    )
+
     def __init__(self, value_set: DiscreteValueSet):
         if not isinstance(value_set, DiscreteValueSet):
             raise TypeError(
@@ -104,6 +151,8 @@ class IssueEstimator:
 
 
 class ValueEstimator:
+    __slots__ = ("count", "utility")
+
     def __init__(self):
         self.count = 0
         self.utility = 0
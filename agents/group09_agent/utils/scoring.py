@@ -0,0 +1,32 @@
+import numpy as np
+
+
+def score_bids(
+    our_utilities: np.ndarray,
+    opponent_utilities: np.ndarray,
+    progress: float,
+    alpha: float = 0.95,
+    eps: float = 0.1,
+) -> np.ndarray:
+    """Calculate heuristic scores for a set of bids at once
+
+    Args:
+        our_utilities (np.ndarray): Our utilities of the bids
+        opponent_utilities (np.ndarray): Predicted opponent utilities of the bids
+        progress (float): Progress of the negotiation session between 0 and 1
+        alpha (float, optional): Trade-off factor between self interested and
+            altruistic behaviour. Defaults to 0.95.
+        eps (float, optional): Time pressure factor, balances between conceding
+            and Boulware behaviour over time. Defaults to 0.1.
+
+    Returns:
+        np.ndarray: scores, aligned with the utilities
+    """
+    time_pressure = 1.0 - progress ** (1 / eps)
+    self_weight = alpha * time_pressure
+
+    # accumulating into the first product saves one temporary compared to a plain
+    # expression, the opponent term still allocates its own
+    scores = np.multiply(our_utilities, self_weight)
+    scores += np.multiply(opponent_utilities, 1.0 - self_weight)
+    return scores
@@ -1,3 +1,4 @@
+import argparse
 import json
 import time
 from pathlib import Path
@@ -5,12 +6,6 @@ from pathlib import Path
 from utils.plot_trace import plot_trace
 from utils.runners import run_session
 
-RESULTS_DIR = Path("results", time.strftime('%Y%m%d-%H%M%S'))
-
-# create results directory if it does not exist
-if not RESULTS_DIR.exists():
-    RESULTS_DIR.mkdir(parents=True)
-
 # Settings to run a negotiation session:
 #   You need to specify the classpath of 2 agents to start a negotiation. Parameters for the agent can be added as a dict (see example)
 #   You need to specify the preference profiles for both agents. The first profile will be assigned to the first agent.
@@ -30,15 +25,58 @@ settings = {
     "deadline_time_ms": 10000,
 }
 
-# run a session and obtain results in dictionaries
-session_results_trace, session_results_summary = run_session(settings)
 
-# plot trace to html file
-if not session_results_trace["error"]:
-    plot_trace(session_results_trace, RESULTS_DIR.joinpath("trace_plot.html"))
+def run(settings: dict, results_dir: Path, plot: bool = True):
+    """run a negotiation session, plot its trace and write the results to results_dir.
+    Can be imported to run several sessions from one process, set plot to False to only
+    write the JSON results (plotly is then never imported)."""
+    # create results directory if it does not exist
+    if not results_dir.exists():
+        results_dir.mkdir(parents=True)
+
+    # run a session and obtain results in dictionaries
+    session_results_trace, session_results_summary = run_session(settings)
+
+    # plot trace to html file
+    if plot and not session_results_trace["error"]:
+        plot_trace(session_results_trace, results_dir.joinpath("trace_plot.html"))
+
+    # write results to file
+    with open(results_dir.joinpath("session_results_trace.json"), "w", encoding="utf-8") as f:
+        json.dump(session_results_trace, f, indent=2)
+    with open(results_dir.joinpath("session_results_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(session_results_summary, f, indent=2)
+
+    return session_results_trace, session_results_summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a single negotiation session.")
+    parser.add_argument(
+        "--profiles",
+        nargs=2,
+        metavar=("PROFILE_A", "PROFILE_B"),
+        help="preference profiles of the agents, overrides the settings above",
+    )
+    parser.add_argument(
+        "--deadline-time-ms",
+        type=int,
+        help="negotiation deadline in ms, overrides the settings above",
+    )
+    parser.add_argument(
+        "--json-only",
+        action="store_true",
+        help="only write the JSON results, do not plot the negotiation trace",
+    )
+    args = parser.parse_args()
+
+    if args.profiles is not None:
+        settings["profiles"] = args.profiles
+    if args.deadline_time_ms is not None:
+        settings["deadline_time_ms"] = args.deadline_time_ms
 
-# write results to file
-with open(RESULTS_DIR.joinpath("session_results_trace.json"), "w", encoding="utf-8") as f:
-    f.write(json.dumps(session_results_trace, indent=2))
-with open(RESULTS_DIR.joinpath("session_results_summary.json"), "w", encoding="utf-8") as f:
-    f.write(json.dumps(session_results_summary, indent=2))
+    run(
+        settings,
+        Path("results", time.strftime('%Y%m%d-%H%M%S')),
+        plot=not args.json_only,
+    )
@@ -131,9 +131,9 @@ tournament_steps, tournament_results, tournament_results_summary = run_tournamen
 
 # save the tournament settings for reference
 with open(RESULTS_DIR.joinpath("tournament_steps.json"), "w", encoding="utf-8") as f:
-    f.write(json.dumps(tournament_steps, indent=2))
+    json.dump(tournament_steps, f, indent=2)
 # save the tournament results
 with open(RESULTS_DIR.joinpath("tournament_results.json"), "w", encoding="utf-8") as f:
-    f.write(json.dumps(tournament_results, indent=2))
+    json.dump(tournament_results, f, indent=2)
 # save the tournament results summary
 tournament_results_summary.to_csv(RESULTS_DIR.joinpath("tournament_results_summary.csv"))
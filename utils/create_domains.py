@@ -1,26 +1,41 @@
 import json
 import math
 import os
+from concurrent.futures import ProcessPoolExecutor
 from itertools import product
 from math import sqrt
-from random import randint
+from random import randint, seed
 from shutil import rmtree
 from string import ascii_uppercase
 from typing import Iterable
 
 import numpy as np
-import plotly.graph_objects as go
 from numpy.random import dirichlet
 
 NUM_DOMAINS_TO_GENERATE = 50
 
 
 def main():
-    for i in range(NUM_DOMAINS_TO_GENERATE):
-        domain = Domain.create_random(f"domain{i:03d}")
-        domain.calculate_specials()
-        domain.generate_visualisation()
-        domain.to_file("domains/")
+    # the domains are independent, so generate them in parallel. Every domain gets its
+    # own seed, as worker processes would otherwise share the global RNG states.
+    seed_sequences = np.random.SeedSequence().spawn(NUM_DOMAINS_TO_GENERATE)
+    with ProcessPoolExecutor() as executor:
+        list(
+            executor.map(
+                generate_domain, range(NUM_DOMAINS_TO_GENERATE), seed_sequences
+            )
+        )
+
+
+def generate_domain(i: int, seed_sequence: np.random.SeedSequence):
+    domain_seed = int(seed_sequence.generate_state(1)[0])
+    seed(domain_seed)
+    np.random.seed(domain_seed)
+
+    domain = Domain.create_random(f"domain{i:03d}")
+    domain.calculate_specials()
+    domain.generate_visualisation()
+    domain.to_file("domains/")
 
 
 class Profile:
@@ -93,7 +108,7 @@ class Profile:
         profile_name = self.profile["LinearAdditiveUtilitySpace"]["name"]
         path = os.path.join(parent_path, domain_name)
         with open(os.path.join(path, f"{profile_name}.json"), "w") as f:
-            f.write(json.dumps(self.profile, indent=2))
+            json.dump(self.profile, f, indent=2)
 
     def get_issues_values(self):
         return self.profile["LinearAdditiveUtilitySpace"]["domain"]["issuesValues"]
@@ -103,6 +118,31 @@ class Profile:
             self.issue_weights[i] * self.value_weights[i][v] for i, v in bid.items()
         )
 
+    def get_all_utilities(self, issues_values: dict) -> np.ndarray:
+        """calculate the utility of every bid in the domain in a single vectorized pass.
+
+        Args:
+            issues_values (dict): issues and their values, the bids are enumerated in the
+                same order as Domain.iter_bids
+
+        Returns:
+            np.ndarray: utility of every bid
+        """
+        # accumulate the weighted value utilities issue by issue, summing in the same
+        # order as get_utility so that the results are identical
+        utilities = np.zeros(())
+        for issue, values in issues_values.items():
+            weighted_values = np.array(
+                [
+                    self.issue_weights[issue] * self.value_weights[issue][value]
+                    for value in values["values"]
+                ],
+                dtype=np.float64,
+            )
+            utilities = np.add.outer(utilities, weighted_values)
+
+        return utilities.ravel()
+
 
 class Domain:
     def __init__(
@@ -128,6 +168,7 @@ class Domain:
         self.distribution = distribution
         self.opposition = opposition
         self.visualisation = visualisation
+        self._all_utilities = None
 
     @classmethod
     def create_random(cls, name):
@@ -182,36 +223,37 @@ class Domain:
     def calculate_specials(self):
         if self.nash_bid:
             return False
-        self.pareto_front = self.get_pareto(list(self.iter_bids()))
-        self.distribution = self.get_distribution(self.iter_bids())
-
-        SW_utility = 0
-        nash_utility = 0
-        kalai_diff = 10
-
-        for pareto_bid in self.pareto_front:
-            utility_A, utility_B = pareto_bid["utility"][0], pareto_bid["utility"][1]
-
-            utility_diff = abs(utility_A - utility_B)
-            utility_prod = utility_A * utility_B
-            utility_sum = utility_A + utility_B
-
-            if utility_diff < kalai_diff:
-                self.kalai_bid = pareto_bid
-                kalai_diff = utility_diff
-                self.opposition = sqrt((utility_A - 1.0) ** 2 + (utility_B - 1.0) ** 2)
-            if utility_prod > nash_utility:
-                self.nash_bid = pareto_bid
-                nash_utility = utility_prod
-            if utility_sum > SW_utility:
-                self.SW_bid = pareto_bid
-                SW_utility = utility_sum
+        # enumerate the bids and their utilities only once for all calculations
+        all_bids = list(self.iter_bids())
+        utilities = self.get_all_utilities()
+        self.pareto_front = self.get_pareto(all_bids, utilities)
+        self.distribution = self.get_distribution(all_bids, utilities)
+
+        # select the special bids on the Pareto front with vectorized arg-min/max. These
+        # return the first occurrence on ties, like the strict comparisons in a loop would.
+        pareto_A, pareto_B = self._get_pareto_utilities()
+
+        self.kalai_bid = self.pareto_front[int(np.argmin(np.abs(pareto_A - pareto_B)))]
+        utility_A, utility_B = self.kalai_bid["utility"]
+        self.opposition = sqrt((utility_A - 1.0) ** 2 + (utility_B - 1.0) ** 2)
+
+        utility_prod = pareto_A * pareto_B
+        nash_index = int(np.argmax(utility_prod))
+        if utility_prod[nash_index] > 0:
+            self.nash_bid = self.pareto_front[nash_index]
+
+        utility_sum = pareto_A + pareto_B
+        SW_index = int(np.argmax(utility_sum))
+        if utility_sum[SW_index] > 0:
+            self.SW_bid = self.pareto_front[SW_index]
 
         return True
 
     def generate_visualisation(self):
-        bid_utils = [self.get_utilities(bid) for bid in self.iter_bids()]
-        bid_utils = list(zip(*bid_utils))
+        # only needed here, so computing the specials does not pay for importing plotly
+        import plotly.graph_objects as go
+
+        bid_utils = self.get_all_utilities().T
 
         fig = go.Figure()
 
@@ -226,12 +268,12 @@ class Domain:
         )
 
         if self.pareto_front:
-            pareto_utils = [bid["utility"] for bid in self.pareto_front]
-            pareto_utils = list(zip(*pareto_utils))
+            # the front is already sorted on utility A, so the line can be drawn directly
+            pareto_A, pareto_B = self._get_pareto_utilities()
             fig.add_trace(
                 go.Scatter(
-                    x=pareto_utils[0],
-                    y=pareto_utils[1],
+                    x=pareto_A,
+                    y=pareto_B,
                     mode="lines+markers",
                     name="Pareto",
                     marker=dict(size=3),
@@ -268,7 +310,7 @@ class Domain:
 
         fig.update_layout(
             title=dict(
-                text=f"{self.get_name()}<br><sub>(size: {len(list(self.iter_bids()))}, opposition: {self.opposition:.4f}, distribution: {self.distribution:.4f})</sub>",
+                text=f"{self.get_name()}<br><sub>(size: {self.get_size()}, opposition: {self.opposition:.4f}, distribution: {self.distribution:.4f})</sub>",
                 x=0.5,
                 xanchor="center",
             )
@@ -283,110 +325,130 @@ class Domain:
         os.makedirs(path)
 
         with open(os.path.join(path, f"{self.domain['name']}.json"), "w") as f:
-            f.write(json.dumps(self.domain, indent=2))
+            json.dump(self.domain, f, indent=2)
         self.profile_A.to_file(parent_path)
         self.profile_B.to_file(parent_path)
 
         if self.nash_bid:
             with open(os.path.join(path, "specials.json"), "w") as f:
-                f.write(
-                    json.dumps(
-                        {
-                            "size": len(list(self.iter_bids())),
-                            "opposition": self.opposition,
-                            "distribution": self.distribution,
-                            "social_welfare": self.SW_bid,
-                            "nash": self.nash_bid,
-                            "kalai": self.kalai_bid,
-                            "pareto_front": self.pareto_front,
-                        },
-                        indent=2,
-                    )
+                json.dump(
+                    {
+                        "size": self.get_size(),
+                        "opposition": self.opposition,
+                        "distribution": self.distribution,
+                        "social_welfare": self.SW_bid,
+                        "nash": self.nash_bid,
+                        "kalai": self.kalai_bid,
+                        "pareto_front": self.pareto_front,
+                    },
+                    f,
+                    indent=2,
                 )
-
         if self.visualisation:
             self.visualisation.write_image(
-                file=os.path.join(path, "visualisation.pdf"), scale=5
+                file=os.path.join(path, "visualisation.pdf"), scale=5, validate=False
             )
 
     def iter_bids(self) -> Iterable:
         return iter(self)
 
+    def get_size(self) -> int:
+        """number of bids in the domain, without enumerating them"""
+        return math.prod(len(v["values"]) for v in self.domain["issuesValues"].values())
+
     def get_utilities(self, bid):
         return self.profile_A.get_utility(bid), self.profile_B.get_utility(bid)
 
-    def get_pareto(self, all_bids: list):
-        pareto_front = []
-        # dominated_bids = set()
-        while True:
-            candidate_bid = all_bids.pop(0)
-            bid_nr = 0
-            dominated = False
-            while len(all_bids) != 0 and bid_nr < len(all_bids):
-                bid = all_bids[bid_nr]
-                if self._dominates(candidate_bid, bid):
-                    # If it is dominated remove the bid from all bids
-                    all_bids.pop(bid_nr)
-                    # dominated_bids.add(frozenset(bid.items()))
-                elif self._dominates(bid, candidate_bid):
-                    dominated = True
-                    # dominated_bids.add(frozenset(candidate_bid.items()))
-                    bid_nr += 1
-                else:
-                    bid_nr += 1
-
-            if not dominated:
-                # add the non-dominated bid to the Pareto frontier
-                pareto_front.append(
-                    {
-                        "bid": candidate_bid,
-                        "utility": [
-                            self.profile_A.get_utility(candidate_bid),
-                            self.profile_B.get_utility(candidate_bid),
-                        ],
-                    }
-                )
-
-            if len(all_bids) == 0:
-                break
-
-        pareto_front = sorted(pareto_front, key=lambda d: d["utility"][0])
+    def get_all_utilities(self) -> np.ndarray:
+        """(n, 2) array with the utilities for A and B of every bid, in iter_bids order.
+        Computed once and shared by the Pareto, distribution and visualisation code."""
+        if self._all_utilities is None:
+            issues_values = self.domain["issuesValues"]
+            self._all_utilities = np.stack(
+                [
+                    self.profile_A.get_all_utilities(issues_values),
+                    self.profile_B.get_all_utilities(issues_values),
+                ],
+                axis=1,
+            )
+        return self._all_utilities
+
+    def get_pareto(self, all_bids: list, utilities: np.ndarray = None):
+        if utilities is None:
+            utilities = np.array(
+                [self.get_utilities(bid) for bid in all_bids], dtype=np.float64
+            ).reshape(-1, 2)
+
+        # sort on utility A descending and then on utility B descending. The sort is
+        # stable, so only the first of a set of bids with equal utilities is kept.
+        order = np.lexsort((-utilities[:, 1], -utilities[:, 0]))
+        utilities_B = utilities[order, 1]
+
+        # sweeping over decreasing utility A, a bid is Pareto optimal if its utility B
+        # is strictly higher than that of every bid before it
+        running_max_B = np.maximum.accumulate(utilities_B)
+        is_pareto = np.ones(len(order), dtype=bool)
+        is_pareto[1:] = utilities_B[1:] > running_max_B[:-1]
+
+        # the Pareto bids have strictly decreasing utility A, so reversing them gives the
+        # front sorted on utility A without another sort
+        pareto_front = [
+            {
+                "bid": all_bids[index],
+                "utility": [float(utilities[index, 0]), float(utilities[index, 1])],
+            }
+            for index in order[is_pareto][::-1]
+        ]
 
         return pareto_front
 
-    def get_distribution(self, bids_iter) -> float:
-        min_distance_sum = 0.0
+    def get_distribution(self, bids_iter, utilities: np.ndarray = None) -> float:
+        if utilities is None:
+            utilities = np.array(
+                [self.get_utilities(bid) for bid in bids_iter], dtype=np.float64
+            ).reshape(-1, 2)
 
-        for i, bid in enumerate(bids_iter):
-            min_distance = self.distance_to_pareto(bid)
-            min_distance_sum += min_distance
-
-        distribution = min_distance_sum / (i + 1)
+        distribution = float(np.mean(self._min_distances_to_pareto(utilities)))
 
         return distribution
 
-    def _dominates(self, bid, candidate_bid):
-        if self.profile_A.get_utility(bid) < self.profile_A.get_utility(candidate_bid):
-            return False
-        elif self.profile_B.get_utility(bid) < self.profile_B.get_utility(
-            candidate_bid
-        ):
-            return False
-        else:
-            return True
-
     def distance_to_pareto(self, bid):
+        return float(self._min_distances_to_pareto(np.array([self.get_utilities(bid)]))[0])
+
+    def _get_pareto_utilities(self):
+        """utilities of the Pareto bids for A and B as two separate contiguous arrays,
+        sorted on utility A"""
         if not self.pareto_front:
             raise ValueError("Pareto front not calculated")
 
-        min_distance = 5.0
-        for pareto_element in self.pareto_front:
-            pareto_bid = pareto_element["bid"]
-            distance = self.distance(pareto_bid, bid)
-            if distance < min_distance:
-                min_distance = distance
+        pareto_A = np.array(
+            [pareto_element["utility"][0] for pareto_element in self.pareto_front],
+            dtype=np.float64,
+        )
+        pareto_B = np.array(
+            [pareto_element["utility"][1] for pareto_element in self.pareto_front],
+            dtype=np.float64,
+        )
+        return pareto_A, pareto_B
+
+    def _min_distances_to_pareto(self, utilities: np.ndarray) -> np.ndarray:
+        """calculate the Euclidian distance in terms of utility between each of a set of bids
+        and the nearest bid on the Pareto front.
+
+        Args:
+            utilities (np.ndarray): (n, 2) array with the utilities of the bids for A and B
+
+        Returns:
+            np.ndarray: minimal distance to the Pareto front for every bid
+        """
+        pareto_A, pareto_B = self._get_pareto_utilities()
+
+        # (n, p) squared distances between all bids and all Pareto bids in one pass
+        difference_A = utilities[:, 0, np.newaxis] - pareto_A
+        difference_B = utilities[:, 1, np.newaxis] - pareto_B
+        squared_distances = difference_A * difference_A + difference_B * difference_B
 
-        return min_distance
+        return np.sqrt(squared_distances.min(axis=1))
 
     def distance(self, bid1, bid2=None):
         """calculate Euclidian distance in terms of utility between a bid and 0 or between two bids.
@@ -1,20 +1,51 @@
 import os
-from collections import defaultdict
 
-import plotly.graph_objects as go
+import numpy as np
+
+# static part of the layout, shared by all trace plots
+LAYOUT = {
+    # "width": 1000,
+    "height": 800,
+    "legend": {
+        "yanchor": "bottom",
+        "y": 1,
+        "xanchor": "left",
+        "x": 0,
+    },
+}
+
+# maximum number of offers per actor for which the offered bids are shown on hover
+MAX_HOVER_BIDS = 2000
 
 
 def plot_trace(results_trace: dict, plot_file: str):
-    utilities = defaultdict(lambda: defaultdict(lambda: {"x": [], "y": [], "bids": []}))
+    # plotly is slow to import, only load it when a plot is actually made
+    import plotly.graph_objects as go
+
+    actions = results_trace["actions"]
+    num_offers = sum(1 for action in actions if "Offer" in action)
+
+    # fill preallocated arrays in a single pass over the trace, the offers of every actor
+    # are selected from them with a mask afterwards. Actors are stored as small integer
+    # ids (in order of their first offer) so the masks are integer comparisons.
+    rounds = np.empty(num_offers, dtype=np.int64)
+    actor_ids = np.empty(num_offers, dtype=np.intp)
+    actors = {}
+    bids = np.empty(num_offers, dtype=object)
+    utilities = {}
     accept = {"x": [], "y": [], "bids": []}
-    for index, action in enumerate(results_trace["actions"], 1):
+    offer_index = 0
+    for index, action in enumerate(actions, 1):
         if "Offer" in action:
             offer = action["Offer"]
-            actor = offer["actor"]
+            rounds[offer_index] = index
+            actor_ids[offer_index] = actors.setdefault(offer["actor"], len(actors))
+            bids[offer_index] = offer["bid"]["issuevalues"]
             for agent, util in offer["utilities"].items():
-                utilities[agent][actor]["x"].append(index)
-                utilities[agent][actor]["y"].append(util)
-                utilities[agent][actor]["bids"].append(offer["bid"]["issuevalues"])
+                if agent not in utilities:
+                    utilities[agent] = np.full(num_offers, np.nan)
+                utilities[agent][offer_index] = util
+            offer_index += 1
         elif "Accept" in action:
             offer = action["Accept"]
             index -= 1
@@ -35,41 +66,54 @@ def plot_trace(results_trace: dict, plot_file: str):
         )
     )
 
+    # the offers of an actor and their hover labels are the same for both agents, so
+    # prepare them once per actor
+    actor_offers = {}
+    for actor, actor_id in actors.items():
+        mask = actor_ids == actor_id
+        actor_bids = bids[mask]
+        # let plotly format the hover labels client-side from the issue values. For long
+        # traces (many offers by the actor) the issue values are left out, as they dominate
+        # the size of the file.
+        # Bids can be partial, so the issues are collected over all bids of the actor and
+        # missing values are left empty.
+        if len(actor_bids) and len(actor_bids) <= MAX_HOVER_BIDS:
+            issues = list(dict.fromkeys(issue for bid in actor_bids for issue in bid))
+        else:
+            issues = []
+        customdata = (
+            [[bid.get(issue, "") for issue in issues] for bid in actor_bids]
+            if issues
+            else None
+        )
+        hovertemplate = "<br>".join(
+            ["<b>utility: %{y:.3f}</b><br>"]
+            + [f"{issue}: %{{customdata[{j}]}}" for j, issue in enumerate(issues)]
+        )
+        actor_offers[actor] = (mask, customdata, f"{hovertemplate}<extra></extra>")
+
     color = {0: "red", 1: "blue"}
-    for i, (agent, data) in enumerate(utilities.items()):
-        for actor, utility in data.items():
-            name = "_".join(agent.split("_")[-2:])
-            text = []
-            for bid, util in zip(utility["bids"], utility["y"]):
-                text.append(
-                    "<br>".join(
-                        [f"<b>utility: {util:.3f}</b><br>"]
-                        + [f"{i}: {v}" for i, v in bid.items()]
-                    )
-                )
+    for i, (agent, agent_utilities) in enumerate(utilities.items()):
+        name = "_".join(agent.split("_")[-2:])
+        for actor, (mask, customdata, hovertemplate) in actor_offers.items():
             fig.add_trace(
                 go.Scatter(
                     mode="lines+markers" if agent == actor else "markers",
-                    x=utilities[agent][actor]["x"],
-                    y=utilities[agent][actor]["y"],
+                    x=rounds[mask],
+                    y=agent_utilities[mask],
                     name=f"{name} offered" if agent == actor else f"{name} received",
                     legendgroup=agent,
                     marker={"color": color[i]},
-                    hovertext=text,
-                    hoverinfo="text",
+                    customdata=customdata,
+                    hovertemplate=hovertemplate,
                 )
             )
 
-    fig.update_layout(
-        # width=1000,
-        height=800,
-        legend={
-            "yanchor": "bottom",
-            "y": 1,
-            "xanchor": "left",
-            "x": 0,
-        },
-    )
+    fig.update_layout(**LAYOUT)
     fig.update_xaxes(title_text="round", range=[0, index + 1], ticks="outside")
     fig.update_yaxes(title_text="utility", range=[0, 1], ticks="outside")
-    fig.write_html(f"{os.path.splitext(plot_file)[0]}.html")
+    # load plotly.js from the CDN instead of embedding ~3.5MB of it in every trace plot.
+    # The figure is validated while it is built, so skip validating it again on write
+    fig.write_html(
+        f"{os.path.splitext(plot_file)[0]}.html", include_plotlyjs="cdn", validate=False
+    )
@@ -162,6 +162,10 @@ def process_results(results_class: SAOPState, results_dict: dict):
             for k, v in results_dict["partyprofiles"].items()
         }
 
+        # bids are often offered repeatedly (e.g. by hardliners), so their utilities are
+        # only computed the first time they are seen
+        utilities_cache = {}
+
         # iterate both action classes and dict entries
         actions_iter = zip(results_class.getActions(), results_dict["actions"])
 
@@ -180,15 +184,20 @@ def process_results(results_class: SAOPState, results_dict: dict):
                     f"Found `None` value in sequence of actions: {action_class}"
                 )
             else:
-                offer["utilities"] = {
-                    k: float(v.getUtility(bid)) for k, v in utility_funcs.items()
-                }
+                if bid not in utilities_cache:
+                    utilities_cache[bid] = {
+                        k: float(v.getUtility(bid)) for k, v in utility_funcs.items()
+                    }
+                offer["utilities"] = dict(utilities_cache[bid])
 
             results_summary["num_offers"] += 1
 
         # gather a summary of results
         if "Accept" in action_dict:
-            utilities_final = list(offer["utilities"].values())
+            # look the utilities up per connection, so they line up with the agents below
+            utilities_final = [
+                offer["utilities"][actor] for actor in results_dict["connections"]
+            ]
             result = "agreement"
         else:
             utilities_final = [0, 0]